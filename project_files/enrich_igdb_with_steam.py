@@ -6,13 +6,25 @@ For each IGDB game that has a corresponding Steam app ID, this script:
 1. Finds the Steam app ID from the external_games field
 2. Makes a call to SteamSpy API to get additional app details
 3. Adds a 'steamInfo' field to the IGDB game data with the SteamSpy response
+
+On disk, the SteamSpy responses are stored once per app in a zstd-compressed
+JSONL sidecar, and each enriched game references its app by 'steam_appid'.
 """
 
-import json
+import asyncio
+import io
 import logging
-import requests
+import os
+import sqlite3
 import time
-from typing import List, Dict, Any, Optional
+import aiohttp
+import ijson
+import orjson
+import zstandard as zstd
+from contextlib import closing
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Set, Tuple
+
+from steam_app_id import extract_steam_app_id
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,22 +32,74 @@ logger = logging.getLogger(__name__)
 
 # SteamSpy API configuration
 STEAMSPY_BASE_URL = 'https://steamspy.com/api.php'
-REQUEST_DELAY = 0.25  # Delay between API requests to be respectful
+REQUEST_DELAY = 0.25  # Minimum spacing between API request starts to be respectful
+MAX_CONCURRENT_REQUESTS = 16  # Cap on in-flight SteamSpy requests
+REQUEST_TIMEOUT = 10  # Seconds
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5  # Seconds, doubled on every retry
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+DNS_CACHE_TTL = 600  # Seconds
+# Bodies shorter than this ("", "null", "[]", error strings) are never valid app
+# details, which take ~300 bytes even for an app with no data
+MIN_STEAMSPY_RESPONSE_SIZE = 50  # Bytes
+
+# Local cache of SteamSpy responses, so reruns only hit the API for missing apps
+STEAMSPY_CACHE_FILE = 'steamspy_cache.sqlite'
+STEAMSPY_CACHE_TTL = 7 * 24 * 60 * 60  # Seconds
+UNKNOWN_FETCHED_AT = 0.0  # Fetch time recorded for data of unknown age, so it is always expired
+CHECKPOINT_INTERVAL = 500  # Commit the cache every this many fetched apps, so a crash loses little work
+
+# Sidecar holding one SteamSpy response per line, keyed by appid
+STEAM_INFO_FILE = 'steam_info.jsonl.zst'
+STEAM_INFO_COMPRESSION_LEVEL = 3
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter for asyncio tasks.
+
+    Each acquisition reserves the next free slot on a monotonic clock and
+    sleeps until it arrives, so request starts are spaced 1/rate seconds apart
+    no matter how many tasks are waiting.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self.next_allowed = time.monotonic()
+
+    async def __aenter__(self):
+        now = time.monotonic()
+        wait = self.next_allowed - now
+        self.next_allowed = max(self.next_allowed, now) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
 
-def load_igdb_games(igdb_games_file: str = 'igdb_games.json') -> List[Dict[str, Any]]:
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+def load_igdb_games(igdb_games_file: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Load IGDB games data.
     
+    Accepts either the JSONL output of fetch_data_from_igdb.py (one game per
+    line) or an older single JSON array file.
+    
     Args:
-        igdb_games_file (str): Path to IGDB games JSON file
+        igdb_games_file (str, optional): Path to IGDB games JSONL or JSON file.
+            Defaults to igdb_games.jsonl, falling back to igdb_games.json.
     
     Returns:
         List[Dict]: List of IGDB games
     """
-    logger.info("Loading IGDB games data...")
+    if igdb_games_file is None:
+        igdb_games_file = 'igdb_games.jsonl' if os.path.exists('igdb_games.jsonl') else 'igdb_games.json'
+    
+    logger.info(f"Loading IGDB games data from {igdb_games_file}...")
     try:
-        with open(igdb_games_file, 'r', encoding='utf-8') as f:
-            igdb_games = json.load(f)
+        with open(igdb_games_file, 'rb') as f:
+            if igdb_games_file.endswith('.jsonl'):
+                igdb_games = [orjson.loads(line) for line in f if line.strip()]
+            else:
+                igdb_games = orjson.loads(f.read())
         
         logger.info(f"Loaded {len(igdb_games)} IGDB games")
         return igdb_games
@@ -44,217 +108,571 @@ def load_igdb_games(igdb_games_file: str = 'igdb_games.json') -> List[Dict[str,
         logger.error(f"Failed to load IGDB games: {e}")
         return []
 
-def load_steam_apps(steam_applist_file: str = 'steam_applist.json') -> Dict[int, Dict[str, Any]]:
+def load_steam_apps(steam_applist_file: str = 'steam_applist.json') -> Set[int]:
     """
-    Load Steam app list and create a dictionary mapping app IDs to app data.
+    Load the set of app IDs from the Steam app list.
     
     Args:
         steam_applist_file (str): Path to Steam app list JSON file
     
     Returns:
-        Dict[int, Dict]: Dictionary mapping Steam app IDs to app data
+        Set[int]: Steam app IDs
     """
     logger.info("Loading Steam app list...")
     try:
-        with open(steam_applist_file, 'r', encoding='utf-8') as f:
-            steam_data = json.load(f)
-        
-        steam_apps = steam_data['applist']['apps']
-        steam_apps_dict = {app['appid']: app for app in steam_apps}
+        # Stream just the app IDs instead of materializing the whole document
+        with open(steam_applist_file, 'rb') as f:
+            steam_apps_set = set(ijson.items(f, 'applist.apps.item.appid'))
         
-        logger.info(f"Loaded {len(steam_apps_dict)} Steam apps")
-        return steam_apps_dict
+        logger.info(f"Loaded {len(steam_apps_set)} Steam apps")
+        return steam_apps_set
         
     except Exception as e:
         logger.error(f"Failed to load Steam app list: {e}")
+        return set()
+
+def iter_steam_info(steam_info_file: str = STEAM_INFO_FILE) -> Iterator[Tuple[Dict[str, Any], Optional[float]]]:
+    """
+    Stream SteamSpy data and fetch times from the compressed sidecar file.
+    
+    Lines are {"fetched_at": ..., "steamInfo": {...}}; sidecars written before
+    fetch times were recorded hold the bare SteamSpy data instead.
+    
+    Args:
+        steam_info_file (str): Path to the zstd-compressed JSONL sidecar
+    
+    Returns:
+        Iterator[Tuple[Dict, Optional[float]]]: SteamSpy data and the time it was
+        fetched, or None if the time is unknown
+    """
+    if not os.path.exists(steam_info_file):
+        return
+    
+    with open(steam_info_file, 'rb') as f:
+        reader = io.BufferedReader(zstd.ZstdDecompressor().stream_reader(f))
+        for line in reader:
+            entry = orjson.loads(line)
+            if 'steamInfo' in entry:
+                yield entry['steamInfo'], entry['fetched_at']
+            else:
+                yield entry, None
+
+def load_steam_info(steam_info_file: str = STEAM_INFO_FILE) -> Dict[int, Dict[str, Any]]:
+    """
+    Load SteamSpy data from the compressed sidecar file.
+    
+    Args:
+        steam_info_file (str): Path to the zstd-compressed JSONL sidecar
+    
+    Returns:
+        Dict[int, Dict]: Dictionary mapping Steam app IDs to SteamSpy data
+    """
+    steam_info = {data['appid']: data for data, _ in iter_steam_info(steam_info_file)}
+    if not steam_info:
         return {}
+    
+    logger.info(f"Loaded SteamSpy data for {len(steam_info)} Steam apps from {steam_info_file}")
+    return steam_info
 
-def get_steamspy_data(app_id: int) -> Optional[Dict[str, Any]]:
+def attach_steam_info(games: List[Dict[str, Any]], steam_info: Dict[int, Dict[str, Any]]):
     """
-    Fetch app details from SteamSpy API.
+    Replace 'steam_appid' references with the referenced 'steamInfo' data, in place.
+    
+    Games that already carry inline steamInfo are left as they are.
     
     Args:
+        games (List[Dict]): Enriched games loaded from disk
+        steam_info (Dict): Dictionary mapping Steam app IDs to SteamSpy data
+    """
+    for game in games:
+        if game.get('steam_appid') in steam_info:
+            game['steamInfo'] = steam_info[game.pop('steam_appid')]
+
+def open_steamspy_cache(cache_file: str = STEAMSPY_CACHE_FILE) -> sqlite3.Connection:
+    """
+    Open (and create if needed) the SteamSpy response cache.
+    
+    Args:
+        cache_file (str): Path to the SQLite cache file
+    
+    Returns:
+        sqlite3.Connection: Connection to the cache database
+    """
+    cache = sqlite3.connect(cache_file)
+    cache.execute(
+        'CREATE TABLE IF NOT EXISTS steamspy ('
+        'appid INTEGER PRIMARY KEY, fetched_at REAL NOT NULL, data BLOB NOT NULL)'
+    )
+    return cache
+
+def get_cached_steamspy_data(cache: sqlite3.Connection, app_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Look up SteamSpy data cached within the last STEAMSPY_CACHE_TTL seconds.
+    
+    Args:
+        cache (sqlite3.Connection): SteamSpy response cache
         app_id (int): Steam app ID
     
     Returns:
-        Optional[Dict]: SteamSpy data or None if request fails
+        Optional[Dict]: Cached SteamSpy data or None if missing or expired
+    """
+    row = cache.execute(
+        'SELECT data FROM steamspy WHERE appid = ? AND fetched_at > ?',
+        (app_id, time.time() - STEAMSPY_CACHE_TTL)
+    ).fetchone()
+    return orjson.loads(row[0]) if row else None
+
+def cache_steamspy_data(cache: sqlite3.Connection, app_id: int, data: Dict[str, Any],
+                        fetched_at: Optional[float] = None, replace: bool = True):
+    """
+    Store SteamSpy data in the cache.
+    
+    Args:
+        cache (sqlite3.Connection): SteamSpy response cache
+        app_id (int): Steam app ID
+        data (Dict): SteamSpy data
+        fetched_at (float, optional): Fetch timestamp, defaults to now
+        replace (bool): Whether to overwrite an existing entry
+    """
+    cache.execute(
+        f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO steamspy (appid, fetched_at, data) VALUES (?, ?, ?)",
+        (app_id, time.time() if fetched_at is None else fetched_at, orjson.dumps(data))
+    )
+
+def seed_steamspy_cache(cache: sqlite3.Connection, enriched_file: str = 'igdb_games_enriched.json',
+                        steam_info_file: str = STEAM_INFO_FILE):
+    """
+    Seed the SteamSpy cache from the output of a previous enrichment.
+    
+    Sidecar entries keep the time they were originally fetched from SteamSpy,
+    so they expire as if they had been cached back then. Data whose fetch time
+    was never recorded (older sidecars, inline steamInfo in enriched_file) is
+    stamped UNKNOWN_FETCHED_AT: it is never served as fresh, but its age is
+    carried through when the sidecar is rewritten. Entries already in the
+    cache are left as they are.
+    
+    Args:
+        cache (sqlite3.Connection): SteamSpy response cache
+        enriched_file (str): Path to a previously enriched IGDB games JSON file
+        steam_info_file (str): Path to the SteamSpy sidecar written alongside it
     """
     try:
-        params = {
-            'request': 'appdetails',
-            'appid': app_id
-        }
+        seeded_count = 0
+        for steam_info, fetched_at in iter_steam_info(steam_info_file):
+            if steam_info.get('appid'):
+                fetched_at = UNKNOWN_FETCHED_AT if fetched_at is None else fetched_at
+                cache_steamspy_data(cache, steam_info['appid'], steam_info, fetched_at, replace=False)
+                seeded_count += 1
+        
+        if os.path.exists(enriched_file):
+            with open(enriched_file, 'rb') as f:
+                enriched_games = orjson.loads(f.read())
+            for game in enriched_games:
+                steam_info = game.get('steamInfo')
+                if steam_info and steam_info.get('appid'):
+                    cache_steamspy_data(cache, steam_info['appid'], steam_info, UNKNOWN_FETCHED_AT, replace=False)
+                    seeded_count += 1
         
-        response = requests.get(STEAMSPY_BASE_URL, params=params, timeout=10)
-        response.raise_for_status()
+        cache.commit()
+        logger.info(f"Seeded SteamSpy cache with {seeded_count} entries from {steam_info_file} and {enriched_file}")
         
-        data = response.json()
+    except Exception as e:
+        logger.warning(f"Failed to seed SteamSpy cache: {e}")
+
+def create_steamspy_session() -> aiohttp.ClientSession:
+    """
+    Create the HTTP session used for SteamSpy requests.
+    
+    One session should be shared by every phase of a run, so later phases reuse
+    its open connections and DNS cache. Must be called from a running event loop.
+    
+    Returns:
+        aiohttp.ClientSession: Session with a pooled connector
+    """
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS, ttl_dns_cache=DNS_CACHE_TTL)
+    return aiohttp.ClientSession(connector=connector)
 
+async def get_steamspy_data(session: aiohttp.ClientSession, app_id: int, limiter: RateLimiter,
+                            base_url: str = STEAMSPY_BASE_URL) -> Optional[Dict[str, Any]]:
+    """
+    Fetch app details from SteamSpy API.
+    
+    Every attempt, retries included, waits for its own rate limiter slot, so
+    backing off after a 429 never bursts above the request budget.
+    
+    Args:
+        session (aiohttp.ClientSession): Session used for the request
+        app_id (int): Steam app ID
+        limiter (RateLimiter): Spaces out request starts
+        base_url (str): SteamSpy API endpoint
+    
+    Returns:
+        Optional[Dict]: SteamSpy data or None if request fails
+    """
+    params = {
+        'request': 'appdetails',
+        'appid': app_id
+    }
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            async with limiter, session.get(base_url, params=params, timeout=timeout) as response:
+                retry = response.status in RETRY_STATUSES and attempt < MAX_RETRIES
+                if not retry:
+                    response.raise_for_status()
+                    raw = await response.read()
+
+            if not retry:
+                break
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+        # Don't bother parsing bodies too short to hold app details
+        if len(raw) < MIN_STEAMSPY_RESPONSE_SIZE:
+            logger.debug(f"No valid data returned for app ID {app_id}")
+            return None
+
+        data = orjson.loads(raw)
         if data and data.get('appid') == app_id:
             return data
         else:
             logger.debug(f"No valid data returned for app ID {app_id}")
             return None
             
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.warning(f"Failed to fetch SteamSpy data for app ID {app_id}: {e}")
         return None
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logger.warning(f"Invalid JSON response for app ID {app_id}: {e}")
         return None
     except Exception as e:
         logger.warning(f"Unexpected error fetching data for app ID {app_id}: {e}")
         return None
 
+async def fetch_one(session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+                    limiter: RateLimiter, app_id: int,
+                    base_url: str = STEAMSPY_BASE_URL) -> tuple[int, Optional[Dict[str, Any]]]:
+    """
+    Fetch SteamSpy data for one app ID, bounded by the semaphore and rate limiter.
+    
+    Args:
+        session (aiohttp.ClientSession): Session used for the request
+        sem (asyncio.Semaphore): Caps the number of in-flight requests
+        limiter (RateLimiter): Spaces out request starts
+        app_id (int): Steam app ID
+        base_url (str): SteamSpy API endpoint
+    
+    Returns:
+        tuple: The app ID and its SteamSpy data (None if the request failed)
+    """
+    async with sem:
+        return app_id, await get_steamspy_data(session, app_id, limiter, base_url)
+
 def find_steam_app_id(igdb_game: Dict[str, Any]) -> Optional[int]:
     """
     Find Steam app ID from IGDB game's external_games field.
     
+    Games fetched by fetch_data_from_igdb.py carry the ID pre-resolved in
+    '_steam_appid'; older data is scanned instead.
+    
     Args:
         igdb_game (Dict): IGDB game data
     
     Returns:
         Optional[int]: Steam app ID or None if not found
     """
-    external_games = igdb_game.get('external_games', [])
-    steam_category_id = 1  # Steam's category ID in IGDB external_games
-    
-    for external_game in external_games:
-        if external_game.get('external_game_source')['name'] == 'Steam':
-            try:
-                return int(external_game.get('uid', 0))
-            except (ValueError, TypeError):
-                continue
+    if '_steam_appid' in igdb_game:
+        return igdb_game['_steam_appid']
     
-    return None
+    return extract_steam_app_id(igdb_game)
 
-def enrich_igdb_with_steam_data(igdb_games: List[Dict[str, Any]], 
-                               steam_apps_dict: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+async def enrich_igdb_with_steam_data(session: aiohttp.ClientSession,
+                                     igdb_games: List[Dict[str, Any]], 
+                                     steam_apps_set: Set[int],
+                                     cache: sqlite3.Connection) -> Tuple[List[Dict[str, Any]], List[int]]:
     """
     Enrich IGDB games with Steam information from SteamSpy API.
     
+    Games are updated in place. Apps with a fresh entry in the SteamSpy cache
+    are not re-fetched. The rest are requested concurrently, capped at
+    MAX_CONCURRENT_REQUESTS in flight and one request start per REQUEST_DELAY
+    seconds, and cached as they arrive. The cache is committed every
+    CHECKPOINT_INTERVAL apps, so an interrupted run resumes from there.
+    
+    The Steam app IDs that could not be fetched are written to
+    failed_steamspy_fetches.json on every run, so the file never lists the
+    failures of an earlier run.
+    
     Args:
+        session (aiohttp.ClientSession): Session used for SteamSpy requests
         igdb_games (List[Dict]): List of IGDB games
-        steam_apps_dict (Dict): Dictionary of Steam apps
+        steam_apps_set (Set[int]): Known Steam app IDs
+        cache (sqlite3.Connection): SteamSpy response cache
     
     Returns:
-        List[Dict]: Enriched IGDB games with steamInfo field where applicable
+        Tuple[List[Dict], List[int]]: The same IGDB games, with steamInfo field
+        where applicable, and the Steam app IDs that failed to fetch
     """
-    enriched_games = []
     failed_steam_ids = []
     steam_enriched_count = 0
-    games_to_process = igdb_games
     
-    logger.info(f"Processing {len(games_to_process)} IGDB games...")
+    logger.info(f"Processing {len(igdb_games)} IGDB games...")
     
-    for i, igdb_game in enumerate(games_to_process):
-        if i % 500 == 0:
-            logger.info(f"Processed {i}/{len(games_to_process)} games, enriched {steam_enriched_count} with Steam data")
-        
-        enriched_game = igdb_game.copy()
+    # (game, Steam app ID) for every game known to Steam
+    games_with_steam_id = []
+    for igdb_game in igdb_games:
         steam_app_id = find_steam_app_id(igdb_game)
+        if steam_app_id and steam_app_id in steam_apps_set:
+            games_with_steam_id.append((igdb_game, steam_app_id))
+    
+    # Several IGDB games can share a Steam app, so only fetch each app once
+    steam_app_ids = list(dict.fromkeys(steam_app_id for _, steam_app_id in games_with_steam_id))
+    
+    steamspy_results = {}
+    for steam_app_id in steam_app_ids:
+        cached_data = get_cached_steamspy_data(cache, steam_app_id)
+        if cached_data:
+            steamspy_results[steam_app_id] = cached_data
+    
+    steam_app_ids = [steam_app_id for steam_app_id in steam_app_ids if steam_app_id not in steamspy_results]
+    logger.info(f"Found {len(steamspy_results)} Steam apps in cache, fetching {len(steam_app_ids)} from SteamSpy...")
+    
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    limiter = RateLimiter(1 / REQUEST_DELAY)
+    
+    tasks = [fetch_one(session, sem, limiter, steam_app_id) for steam_app_id in steam_app_ids]
+    for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+        steam_app_id, steamspy_data = await task
+        steamspy_results[steam_app_id] = steamspy_data
+        if steamspy_data:
+            cache_steamspy_data(cache, steam_app_id, steamspy_data)
+        if done % CHECKPOINT_INTERVAL == 0:
+            cache.commit()
+            logger.info(f"Fetched {done}/{len(steam_app_ids)} Steam apps")
+    
+    for igdb_game, steam_app_id in games_with_steam_id:
+        steamspy_data = steamspy_results.get(steam_app_id)
         
-        if steam_app_id and steam_app_id in steam_apps_dict:
-            steamspy_data = get_steamspy_data(steam_app_id)
-            
-            if steamspy_data:
-                enriched_game['steamInfo'] = steamspy_data
-                steam_enriched_count += 1
-                logger.debug(f"Enriched '{igdb_game.get('name', 'Unknown')}' with Steam data (App ID: {steam_app_id})")
-            else:
-                failed_steam_ids.append(steam_app_id)
+        if steamspy_data:
+            igdb_game['steamInfo'] = steamspy_data
+            steam_enriched_count += 1
+            logger.debug(f"Enriched '{igdb_game.get('name', 'Unknown')}' with Steam data (App ID: {steam_app_id})")
+        else:
+            failed_steam_ids.append(steam_app_id)
+    
+    # Games sharing a Steam app each recorded the same failure; keep one per app
+    failed_steam_ids = list(dict.fromkeys(failed_steam_ids))
+    
+    logger.info(f"Enrichment complete! {steam_enriched_count}/{len(igdb_games)} games enriched with Steam data")
 
-            time.sleep(REQUEST_DELAY)
-        
-        enriched_games.append(enriched_game)
+    with open('failed_steamspy_fetches.json', 'wb') as f:
+        f.write(orjson.dumps(failed_steam_ids))
+    
+    return igdb_games, failed_steam_ids
+
+def write_json_array(items: Iterable[Dict[str, Any]], f):
+    """
+    Write items as a JSON array one at a time.
+    
+    Produces the same bytes as orjson.dumps(list(items), option=orjson.OPT_INDENT_2)
+    without building the whole document in memory.
+    
+    Args:
+        items (Iterable[Dict]): Items to write
+        f: File object opened in binary mode
+    """
+    f.write(b'[')
+    empty = True
+    for item in items:
+        f.write(b'\n  ' if empty else b',\n  ')
+        f.write(orjson.dumps(item, option=orjson.OPT_INDENT_2).replace(b'\n', b'\n  '))
+        empty = False
+    f.write(b']' if empty else b'\n]')
+
+def reference_steam_info(games: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield games with inline steamInfo replaced by a 'steam_appid' reference.
+    
+    The ingest-time '_steam_appid' lookup field is dropped as well, so
+    'steam_appid' is the only app ID left in the output. The games themselves
+    are not modified; games with either field are yielded as shallow copies.
+    
+    Args:
+        games (Iterable[Dict]): Enriched games
     
-    logger.info(f"Enrichment complete! {steam_enriched_count}/{len(games_to_process)} games enriched with Steam data")
+    Returns:
+        Iterator[Dict]: Games ready to be written next to the SteamSpy sidecar
+    """
+    for game in games:
+        if 'steamInfo' not in game and '_steam_appid' not in game:
+            yield game
+            continue
+        
+        referenced_game = {key: value for key, value in game.items()
+                           if key not in ('steamInfo', '_steam_appid')}
+        if 'steamInfo' in game:
+            referenced_game['steam_appid'] = game['steamInfo']['appid']
+        yield referenced_game
 
-    if failed_steam_ids:
-        with open('failed_steamspy_fetches.json', 'w') as f:
-            json.dump(failed_steam_ids, f)
+def save_steam_info(games: List[Dict[str, Any]], steam_info_file: str = STEAM_INFO_FILE,
+                    cache: Optional[sqlite3.Connection] = None):
+    """
+    Write each distinct steamInfo payload once to the zstd-compressed JSONL sidecar.
     
-    return enriched_games
+    Payloads are stored with their fetch time from the cache, so a later run
+    can seed its cache without treating old data as fresh. Payloads the cache
+    has no entry for keep the fetch time already recorded in the sidecar being
+    replaced, and are only written bare if neither knows it.
+    
+    Args:
+        games (List[Dict]): Enriched games
+        steam_info_file (str): Output file path
+        cache (sqlite3.Connection, optional): SteamSpy response cache holding the fetch times
+    """
+    written_app_ids = set()
+    compressor = zstd.ZstdCompressor(level=STEAM_INFO_COMPRESSION_LEVEL)
+    
+    # Read before the file is truncated below
+    previous_fetch_times = {
+        data['appid']: fetched_at
+        for data, fetched_at in iter_steam_info(steam_info_file)
+        if fetched_at is not None
+    }
+    
+    with open(steam_info_file, 'wb') as f, compressor.stream_writer(f) as writer:
+        for game in games:
+            steam_info = game.get('steamInfo')
+            if not steam_info or steam_info['appid'] in written_app_ids:
+                continue
+            
+            row = cache.execute(
+                'SELECT fetched_at FROM steamspy WHERE appid = ?', (steam_info['appid'],)
+            ).fetchone() if cache else None
+            fetched_at = row[0] if row else previous_fetch_times.get(steam_info['appid'])
+            entry = steam_info if fetched_at is None else {'fetched_at': fetched_at, 'steamInfo': steam_info}
+            writer.write(orjson.dumps(entry) + b'\n')
+            written_app_ids.add(steam_info['appid'])
 
 def save_enriched_data(enriched_games: List[Dict[str, Any]], 
-                      output_file: str = 'igdb_games_enriched.json'):
+                      output_file: str = 'igdb_games_enriched.json',
+                      steam_info_file: str = STEAM_INFO_FILE,
+                      cache: Optional[sqlite3.Connection] = None):
     """
-    Save enriched IGDB games data to JSON file.
+    Save enriched IGDB games data to JSON file, with SteamSpy data in a sidecar.
     
     Args:
         enriched_games (List[Dict]): Enriched games data
         output_file (str): Output file path
+        steam_info_file (str): Output path for the SteamSpy sidecar
+        cache (sqlite3.Connection, optional): SteamSpy response cache holding the fetch times
     """
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(enriched_games, f, indent=2, ensure_ascii=False)
-        logger.info(f"Enriched data saved to {output_file}")
+        save_steam_info(enriched_games, steam_info_file, cache)
+        with open(output_file, 'wb') as f:
+            write_json_array(reference_steam_info(enriched_games), f)
+        logger.info(f"Enriched data saved to {output_file} (SteamSpy data in {steam_info_file})")
     except Exception as e:
         logger.error(f"Failed to save enriched data: {e}")
 
-def print_enrichment_summary(enriched_games: List[Dict[str, Any]]):
+def print_enrichment_summary(enriched_games: Iterable[Dict[str, Any]], sample_size: int = 5):
     """
     Print a summary of the enrichment process.
     
+    Counts and samples are gathered in a single pass, so any iterable of games
+    works, including one streamed from disk.
+    
     Args:
-        enriched_games (List[Dict]): Enriched games data
+        enriched_games (Iterable[Dict]): Enriched games data
+        sample_size (int): Number of enriched games to show
     """
-    total_games = len(enriched_games)
-    games_with_steam_info = sum(1 for game in enriched_games if 'steamInfo' in game)
+    total_games = 0
+    games_with_steam_info = 0
+    samples = []
+    for game in enriched_games:
+        total_games += 1
+        if 'steamInfo' in game:
+            games_with_steam_info += 1
+            if len(samples) < sample_size:
+                samples.append(game)
     
     print("\n" + "="*60)
     print("IGDB-STEAM ENRICHMENT SUMMARY")
     print("="*60)
     print(f"Total IGDB games processed: {total_games:,}")
     print(f"Games enriched with Steam data: {games_with_steam_info:,}")
-    print(f"Enrichment rate: {(games_with_steam_info/total_games*100):.1f}%")
+    if total_games:
+        print(f"Enrichment rate: {(games_with_steam_info/total_games*100):.1f}%")
     
-    if games_with_steam_info > 0:
+    if samples:
         print(f"\nSample of enriched games:")
-        count = 0
-        for game in enriched_games:
-            if 'steamInfo' in game and count < 5:
-                steam_info = game['steamInfo']
-                igdb_name = game.get('name', 'Unknown')
-                steam_name = steam_info.get('name', 'Unknown')
-                owners = steam_info.get('owners', 'Unknown')
-                print(f"{count+1}. IGDB: '{igdb_name}' -> Steam: '{steam_name}' (Owners: {owners})")
-                count += 1
+        for i, game in enumerate(samples, start=1):
+            steam_info = game['steamInfo']
+            igdb_name = game.get('name', 'Unknown')
+            steam_name = steam_info.get('name', 'Unknown')
+            owners = steam_info.get('owners', 'Unknown')
+            print(f"{i}. IGDB: '{igdb_name}' -> Steam: '{steam_name}' (Owners: {owners})")
     
     print("="*60)
 
-def main():
-    """Main function to orchestrate the enrichment process."""
-    print("IGDB-Steam Enrichment Tool")
-    print("Enriching IGDB games with Steam data from SteamSpy API...")
+async def run_enrich(session: aiohttp.ClientSession,
+                     cache: sqlite3.Connection) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Load the input data, enrich it with SteamSpy data, and save the result.
+    
+    Args:
+        session (aiohttp.ClientSession): Session used for SteamSpy requests
+        cache (sqlite3.Connection): SteamSpy response cache
     
+    Returns:
+        Tuple[List[Dict], List[int]]: Enriched games and the Steam app IDs that
+        failed to fetch, or two empty lists if the run could not proceed
+    """
     # Load data
     igdb_games = load_igdb_games()
     if not igdb_games:
         logger.error("Failed to load IGDB games. Exiting.")
-        return
+        return [], []
     
-    steam_apps_dict = load_steam_apps()
-    if not steam_apps_dict:
+    steam_apps_set = load_steam_apps()
+    if not steam_apps_set:
         logger.error("Failed to load Steam apps. Exiting.")
-        return
+        return [], []
     
     has_external_games = any('external_games' in game for game in igdb_games[:10])
     if not has_external_games:
         logger.error("IGDB data does not contain external_games field. Cannot find Steam app IDs.")
-        return
+        return [], []
     
     print(f"\nFound {len(igdb_games):,} IGDB games to process.")
     print("Note: This will make API calls to SteamSpy, which may take a while.")
     
-    enriched_games = enrich_igdb_with_steam_data(igdb_games, steam_apps_dict)
+    enriched_games, failed_steam_ids = await enrich_igdb_with_steam_data(session, igdb_games, steam_apps_set, cache)
     
     if enriched_games:
-        save_enriched_data(enriched_games)
+        save_enriched_data(enriched_games, cache=cache)
         print_enrichment_summary(enriched_games)
         
     else:
         logger.error("No games were processed successfully.")
+    
+    return enriched_games, failed_steam_ids
+
+def main():
+    """Main function to orchestrate the enrichment process."""
+    print("IGDB-Steam Enrichment Tool")
+    print("Enriching IGDB games with Steam data from SteamSpy API...")
+    
+    async def run(cache: sqlite3.Connection):
+        async with create_steamspy_session() as session:
+            await run_enrich(session, cache)
+    
+    with closing(open_steamspy_cache()) as cache:
+        seed_steamspy_cache(cache)
+        try:
+            asyncio.run(run(cache))
+        finally:
+            # Keep whatever was fetched, even if the run was interrupted
+            cache.commit()
 
 if __name__ == '__main__':
     main()
@@ -1,11 +1,25 @@
 import os
-import json
+import threading
+from itertools import islice
 import time
+import orjson
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import List, Dict, Any
 import logging
 from dotenv import load_dotenv
 
+from steam_app_id import extract_steam_app_id
+
+# urllib3 can only decode brotli responses when a brotli package is installed
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'br, gzip'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip'
+
 # # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -23,6 +37,36 @@ CLIENT_ACCESS_TOKEN = os.getenv('TWITCH_ACCESS_TOKEN')
 TWITCH_TOKEN_URL = 'https://id.twitch.tv/oauth2/token'
 IGDB_BASE_URL = 'https://api.igdb.com/v4'
 
+# IGDB allows up to 4 requests per second
+REQUESTS_PER_SECOND = 4
+REQUEST_TIMEOUT = 30  # Seconds
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5  # Seconds, doubled on every retry
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Fields and filter for the games query
+GAMES_QUERY_FIELDS = """
+    id,
+    aggregated_rating,
+    aggregated_rating_count,
+    first_release_date,
+    player_perspectives.id,
+    player_perspectives.name,
+    rating,
+    rating_count,
+    name,
+    themes.name,
+    themes.id,
+    game_modes.name,
+    game_modes.id,
+    genres.name,
+    genres.id,
+    hypes,
+    external_games.category,
+    external_games.uid,
+    external_games.external_game_source.name"""
+GAMES_QUERY_FILTER = '(rating_count >= 100 | aggregated_rating_count >= 1) & game_type.id = 0'
+
 class IGDBController:
     """Class to handle IGDB API authentication and data fetching."""
     
@@ -36,10 +80,48 @@ class IGDBController:
             'Accept': 'application/json'
         }
 
+        # Reuse one keep-alive connection pool for every batch request, and ask
+        # for compressed responses. IGDB queries are read-only, so retrying POSTs is safe.
+        # urllib3 only retries connection errors here: retries on error statuses are
+        # made by make_api_request, so that they wait for the rate limiter.
+        self.session = requests.Session()
+        self.session.headers.update({**self.headers, 'Accept-Encoding': ACCEPT_ENCODING})
+        self.session.mount('https://', HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=8,
+            max_retries=Retry(
+                total=MAX_RETRIES,
+                backoff_factor=RETRY_BACKOFF,
+                allowed_methods=frozenset(['POST'])
+            )
+        ))
+
+        # Earliest monotonic time at which the next request may start
+        self._next_request_time = time.monotonic()
+        self._rate_limit_lock = threading.Lock()
+
+    def _wait_for_rate_limit(self):
+        """
+        Block until the next request slot, spacing request starts
+        1/REQUESTS_PER_SECOND apart. Only the remainder of the interval is
+        slept, so time spent waiting on earlier responses counts towards it.
+        """
+        with self._rate_limit_lock:
+            now = time.monotonic()
+            wait = self._next_request_time - now
+            self._next_request_time = max(self._next_request_time, now) + 1 / REQUESTS_PER_SECOND
+
+        if wait > 0:
+            time.sleep(wait)
+
     def make_api_request(self, endpoint: str, query: str) -> List[Dict[Any, Any]]:
         """
         Make a request to the IGDB API.
         
+        Responses with a status in RETRY_STATUSES are retried with exponential
+        backoff. Every attempt waits for its own rate limiter slot, so several
+        workers hitting a 429 at once never burst above REQUESTS_PER_SECOND.
+        
         Args:
             endpoint (str): API endpoint (e.g., 'games')
             query (str): IGDB query string
@@ -49,108 +131,132 @@ class IGDBController:
         """
         url = f"{IGDB_BASE_URL}/{endpoint}"
 
-        response = requests.post(url, **{ 'headers': self.headers, 'data': query })
+        for attempt in range(MAX_RETRIES + 1):
+            self._wait_for_rate_limit()
+            response = self.session.post(url, data=query, timeout=REQUEST_TIMEOUT)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                break
+            
+            logger.warning(f"{endpoint} returned {response.status_code}, retrying (attempt {attempt + 1}/{MAX_RETRIES})")
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
 
         # print(response.text)
-        return response.json()
+        return orjson.loads(response.content)
+
+    def count_games(self) -> int:
+        """
+        Count the games matching the games query filter.
+
+        Returns:
+            int: Number of matching games, or 0 if the count request fails
+        """
+        result = self.make_api_request('games/count', f"where {GAMES_QUERY_FILTER};")
+
+        if not isinstance(result, dict) or 'count' not in result:
+            logger.error(f"Unexpected response from games/count: {result}")
+            return 0
+
+        return result['count']
+
+    def _fetch_at_offset(self, offset: int, limit: int) -> List[Dict[Any, Any]]:
+        """
+        Fetch one batch of games.
+
+        Args:
+            offset (int): Offset of the first game in the batch
+            limit (int): Number of games in the batch
 
-    def fetch_games(self, max_games: int = None, batch_size: int = 500) -> List[Dict[Any, Any]]:
+        Returns:
+            List[Dict]: Game data for the batch
+
+        Raises:
+            ValueError: If IGDB returns anything other than a list of games
         """
-        Fetch games until no more entries are available or max_games is reached.
+        # IGDB query to get games with comprehensive data
+        query = f"""
+         fields {GAMES_QUERY_FIELDS};
+         where {GAMES_QUERY_FILTER};
+         limit {limit};
+         offset {offset};
+         """
+
+        logger.info(f"Fetching games {offset+1}-{offset+limit}")
+
+        games_batch = self.make_api_request('games', query)
+
+        # Errors come back as an object, e.g. {"message": ...}, rather than a list of games
+        if not isinstance(games_batch, list):
+            raise ValueError(f"IGDB games request at offset {offset} failed: {games_batch}")
+
+        if not games_batch:
+            logger.warning(f"No games returned for offset {offset}")
+            return []
+
+        # Resolve the Steam app ID once here so downstream scripts can read it directly
+        for game in games_batch:
+            game['_steam_appid'] = extract_steam_app_id(game)
+
+        return games_batch
+
+    def fetch_games(self, max_games: int = None, batch_size: int = 500,
+                    out_path: str = 'igdb_games.jsonl') -> int:
+        """
+        Fetch all available games, or up to max_games, into a JSONL file.
+
+        The number of matching games is queried first so that batches can be
+        requested concurrently, up to REQUESTS_PER_SECOND at a time. Each batch
+        is written out as soon as it is next in offset order, so the full game
+        list is never held in memory. Games go to a temporary file that only
+        replaces out_path once every batch has succeeded, so a failed fetch
+        leaves any earlier output untouched.
         
         Args:
             max_games (int, optional): Maximum number of games to fetch. If None, fetch all available.
             batch_size (int): Number of games per API request (max 500)
+            out_path (str): Output JSONL file, one game per line
         Returns:
-            List[Dict]: List of game data
+            int: Number of games written
         """
         if not self.access_token:
             logger.error("Not authenticated. Call authenticate() first.")
-            return []
+            return 0
         
-        all_games = []
         batch_size = min(batch_size, 500)
-        offset = 0
         
         logger.info(f"Fetching games (max: {'unlimited' if max_games is None else max_games})...")
         
-        while True:
-            # Stop if we've reached the maximum number of games
-            if max_games is not None and len(all_games) >= max_games:
-                logger.info(f"Reached maximum limit of {max_games} games")
-                break
-                
-            # Calculate batch size for this request
-            if max_games is not None:
-                current_batch_size = min(batch_size, max_games - len(all_games))
-            else:
-                current_batch_size = batch_size
-            
-            # IGDB query to get games with comprehensive data
-            query = f"""
-             fields 
-                 id,
-                 aggregated_rating,
-                 aggregated_rating_count,
-                 first_release_date,
-                 player_perspectives.id,
-                 player_perspectives.name,
-                 rating,
-                 rating_count,
-                 name,
-                 themes.name,
-                 themes.id,
-                 game_modes.name,
-                 game_modes.id,
-                 genres.name,
-                 genres.id,
-                 hypes,
-                 external_games.category,
-                 external_games.uid,
-                 external_games.external_game_source.name;
-             where (rating_count >= 100 | aggregated_rating_count >= 1) & game_type.id = 0;
-             limit {current_batch_size};
-             offset {offset};
-             """
-            
-            logger.info(f"Fetching batch {offset//batch_size + 1}: games {offset+1}-{offset+current_batch_size}")
-            
-            games_batch = self.make_api_request('games', query)
-            
-            if not games_batch:
-                logger.warning(f"No games returned for offset {offset}")
-                break
-            
-            all_games.extend(games_batch)
-            
-            # Rate limiting - up to 4 requests per second
-            time.sleep(0.25)
-            
-            # If we got fewer games than requested, we've reached the end
-            if len(games_batch) < current_batch_size:
-                logger.info("Received fewer games than requested, likely reached end of data")
-                break
-            
-            # Move to next batch
-            offset += current_batch_size
+        total_games = self.count_games()
+        if max_games is not None:
+            total_games = min(total_games, max_games)
         
-        logger.info(f"Successfully fetched {len(all_games)} games")
-        return all_games
-    
-    def save_to_json(self, data: List[Dict[Any, Any]], filename: str = 'igdb_top_games.json'):
-        """
-        Save fetched data to JSON file.
+        if total_games == 0:
+            logger.error(f"No games to fetch, leaving {out_path} unchanged")
+            return 0
         
-        Args:
-            data (List[Dict]): Game data to save
-            filename (str): Output filename
-        """
+        offsets = range(0, total_games, batch_size)
+        logger.info(f"Fetching {total_games} games in {len(offsets)} batches")
+        
+        games_written = 0
+        tmp_path = out_path + '.tmp'
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            logger.info(f"Data saved to {filename}")
-        except Exception as e:
-            logger.error(f"Failed to save data: {e}")
+            with ThreadPoolExecutor(max_workers=REQUESTS_PER_SECOND) as executor, open(tmp_path, 'wb') as f:
+                # executor.map yields batches in offset order, regardless of completion order
+                batches = executor.map(
+                    lambda offset: self._fetch_at_offset(offset, min(batch_size, total_games - offset)),
+                    offsets
+                )
+                for games_batch in batches:
+                    for game in games_batch:
+                        f.write(orjson.dumps(game) + b'\n')
+                    games_written += len(games_batch)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        
+        os.replace(tmp_path, out_path)
+        logger.info(f"Successfully fetched {games_written} games into {out_path}")
+        return games_written
 
 def main():
     controller = IGDBController(CLIENT_ID, CLIENT_SECRET, CLIENT_ACCESS_TOKEN)
@@ -165,18 +271,17 @@ def main():
 
     # # Fetch top games
     try:
-        games = controller.fetch_games(max_games=None, batch_size=500)  # Fetch all available games
+        # Fetch all available games, streaming them to a JSONL file
+        games_count = controller.fetch_games(max_games=None, batch_size=500, out_path='igdb_games.jsonl')
         
-        if games:
-            # Save to JSON file
-            controller.save_to_json(games, 'igdb_games.json')
-            
+        if games_count:
             # Print summary
-            logger.info(f"Fetched {len(games)} games successfully!")
+            logger.info(f"Fetched {games_count} games successfully!")
             logger.info("Sample of top 5 games:")
-            for i, game in enumerate(games[:5]):
-                name = game.get('name', 'Unknown')
-                logger.info(f"{i+1}. {name}")
+            with open('igdb_games.jsonl', 'rb') as f:
+                for i, line in enumerate(islice(f, 5)):
+                    name = orjson.loads(line).get('name', 'Unknown')
+                    logger.info(f"{i+1}. {name}")
         else:
             logger.error("No games were fetched")
             
@@ -5,117 +5,125 @@ Retry script for failed SteamSpy fetches.
 This script:
 1. Loads the failed Steam IDs from failed_steamspy_fetches.json
 2. Attempts to fetch SteamSpy data for each failed ID
-3. Updates the corresponding entries in igdb_games_enriched.json
+3. Updates the corresponding entries in igdb_games_enriched.json and its
+   SteamSpy sidecar, steam_info.jsonl.zst
 """
 
-import json
+import asyncio
 import logging
-import requests
-import time
+import aiohttp
+import orjson
+import sqlite3
+from contextlib import closing
 from typing import List, Dict, Any, Optional
 
+from enrich_igdb_with_steam import (
+    CHECKPOINT_INTERVAL,
+    MAX_CONCURRENT_REQUESTS,
+    REQUEST_DELAY,
+    STEAM_INFO_FILE,
+    RateLimiter,
+    fetch_one,
+    create_steamspy_session,
+    load_steam_info,
+    attach_steam_info,
+    find_steam_app_id,
+    open_steamspy_cache,
+    seed_steamspy_cache,
+    get_cached_steamspy_data,
+    cache_steamspy_data,
+    write_json_array,
+    reference_steam_info,
+    save_steam_info
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # SteamSpy API configuration
 STEAMSPY_BASE_URL = 'https://steamspy.com/api'
-REQUEST_DELAY = 0.25  # Delay between API requests
 
 def load_failed_steam_ids(failed_file: str = 'failed_steamspy_fetches.json') -> List[int]:
     """Load failed Steam IDs from JSON file."""
     try:
-        with open(failed_file, 'r') as f:
-            failed_ids = json.load(f)
+        with open(failed_file, 'rb') as f:
+            # Files written before failures were deduplicated list shared apps once per game
+            failed_ids = list(dict.fromkeys(orjson.loads(f.read())))
         logger.info(f"Loaded {len(failed_ids)} failed Steam IDs")
         return failed_ids
     except Exception as e:
         logger.error(f"Failed to load failed Steam IDs: {e}")
         return []
 
-def load_enriched_games(enriched_file: str = 'igdb_games_enriched.json') -> List[Dict[str, Any]]:
-    """Load enriched IGDB games data."""
+def load_enriched_games(enriched_file: str = 'igdb_games_enriched.json',
+                        steam_info_file: str = STEAM_INFO_FILE) -> List[Dict[str, Any]]:
+    """Load enriched IGDB games data, re-attaching SteamSpy data from the sidecar."""
     try:
-        with open(enriched_file, 'r', encoding='utf-8') as f:
-            games = json.load(f)
+        with open(enriched_file, 'rb') as f:
+            games = orjson.loads(f.read())
+        attach_steam_info(games, load_steam_info(steam_info_file))
         logger.info(f"Loaded {len(games)} enriched games")
         return games
     except Exception as e:
         logger.error(f"Failed to load enriched games: {e}")
         return []
 
-def get_steamspy_data(app_id: int) -> Optional[Dict[str, Any]]:
-    """Fetch app details from SteamSpy API."""
-    try:
-        params = {
-            'request': 'appdetails',
-            'appid': app_id
-        }
-        
-        response = requests.get(STEAMSPY_BASE_URL, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        if data and data.get('appid') == app_id:
-            return data
-        else:
-            return None
-            
-    except Exception as e:
-        logger.debug(f"Failed to fetch SteamSpy data for app ID {app_id}: {e}")
-        return None
-
-def find_steam_app_id(igdb_game: Dict[str, Any]) -> Optional[int]:
-    """Find Steam app ID from IGDB game's external_games field."""
-    external_games = igdb_game.get('external_games', [])
-    
-    for external_game in external_games:
-        if external_game.get('external_game_source', {}).get('name') == 'Steam':
-            try:
-                return int(external_game.get('uid', 0))
-            except (ValueError, TypeError):
-                continue
-    
-    return None
-
-def retry_failed_fetches(failed_steam_ids: List[int], enriched_games: List[Dict[str, Any]]) -> tuple[List[Dict[str, Any]], List[int]]:
-    """Retry failed SteamSpy fetches and update enriched games."""
-    updated_games = []
+async def retry_failed_fetches(session: aiohttp.ClientSession, failed_steam_ids: List[int],
+                               enriched_games: List[Dict[str, Any]], cache: sqlite3.Connection) -> tuple[List[Dict[str, Any]], List[int]]:
+    """Retry failed SteamSpy fetches concurrently, using cached data where available, and update enriched games."""
     still_failed = []
     success_count = 0
     
-    # Create a mapping of Steam app IDs to game indices for quick lookup
-    steam_id_to_game_index = {}
+    # Several games can share a Steam app, so retry each app once
+    failed_steam_ids = list(dict.fromkeys(failed_steam_ids))
+    
+    # Create a mapping of Steam app IDs to the indices of every game on that app;
+    # find_steam_app_id is a plain field read for freshly fetched games
+    steam_id_to_game_indices = {}
     for i, game in enumerate(enriched_games):
         steam_app_id = find_steam_app_id(game)
         if steam_app_id:
-            steam_id_to_game_index[steam_app_id] = i
+            steam_id_to_game_indices.setdefault(steam_app_id, []).append(i)
     
     logger.info(f"Retrying {len(failed_steam_ids)} failed Steam IDs...")
     
-    for i, steam_app_id in enumerate(failed_steam_ids):
+    # Steam IDs not found in enriched games cannot be retried
+    retry_ids = []
+    for steam_app_id in failed_steam_ids:
+        if steam_app_id not in steam_id_to_game_indices:
+            still_failed.append(steam_app_id)
+            continue
+        
+        # Skip the network for IDs fetched successfully since the last run
+        cached_data = get_cached_steamspy_data(cache, steam_app_id)
+        if cached_data:
+            for i in steam_id_to_game_indices[steam_app_id]:
+                enriched_games[i]['steamInfo'] = cached_data
+            success_count += 1
+        else:
+            retry_ids.append(steam_app_id)
+    
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    limiter = RateLimiter(1 / REQUEST_DELAY)
+    
+    tasks = [fetch_one(session, sem, limiter, steam_app_id, STEAMSPY_BASE_URL) for steam_app_id in retry_ids]
+    for i, task in enumerate(asyncio.as_completed(tasks)):
+        if i % CHECKPOINT_INTERVAL == 0:
+            cache.commit()
         if i % 50 == 0:
-            logger.info(f"Processed {i}/{len(failed_steam_ids)} failed IDs, {success_count} successful")
+            logger.info(f"Processed {i}/{len(retry_ids)} failed IDs, {success_count} successful")
         
-        # Find the corresponding game in enriched_games
-        if steam_app_id in steam_id_to_game_index:
-            game_index = steam_id_to_game_index[steam_app_id]
-            
-            # Try to fetch SteamSpy data
-            steamspy_data = get_steamspy_data(steam_app_id)
-            
-            if steamspy_data:
-                # Update the game with Steam info
-                enriched_games[game_index]['steamInfo'] = steamspy_data
-                success_count += 1
-                logger.debug(f"Successfully fetched data for Steam ID {steam_app_id}")
-            else:
-                still_failed.append(steam_app_id)
-            
-            time.sleep(REQUEST_DELAY)
+        steam_app_id, steamspy_data = await task
+        
+        if steamspy_data:
+            # Update every game on this app with Steam info
+            for i in steam_id_to_game_indices[steam_app_id]:
+                enriched_games[i]['steamInfo'] = steamspy_data
+            cache_steamspy_data(cache, steam_app_id, steamspy_data)
+            success_count += 1
+            logger.debug(f"Successfully fetched data for Steam ID {steam_app_id}")
         else:
-            # Steam ID not found in enriched games
             still_failed.append(steam_app_id)
     
     logger.info(f"Retry complete! {success_count}/{len(failed_steam_ids)} previously failed IDs now successful")
@@ -123,11 +131,13 @@ def retry_failed_fetches(failed_steam_ids: List[int], enriched_games: List[Dict[
     
     return enriched_games, still_failed
 
-def save_updated_games(enriched_games: List[Dict[str, Any]], output_file: str = 'igdb_games_enriched.json'):
-    """Save updated enriched games data."""
+def save_updated_games(enriched_games: List[Dict[str, Any]], output_file: str = 'igdb_games_enriched.json',
+                       steam_info_file: str = STEAM_INFO_FILE, cache: Optional[sqlite3.Connection] = None):
+    """Save updated enriched games data, with SteamSpy data and fetch times in the sidecar."""
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(enriched_games, f, indent=2, ensure_ascii=False)
+        save_steam_info(enriched_games, steam_info_file, cache)
+        with open(output_file, 'wb') as f:
+            write_json_array(reference_steam_info(enriched_games), f)
         logger.info(f"Updated enriched data saved to {output_file}")
     except Exception as e:
         logger.error(f"Failed to save updated data: {e}")
@@ -135,34 +145,35 @@ def save_updated_games(enriched_games: List[Dict[str, Any]], output_file: str =
 def save_still_failed(still_failed: List[int], output_file: str = 'failed_steamspy_fetches.json'):
     """Save still failed Steam IDs."""
     try:
-        with open(output_file, 'w') as f:
-            json.dump(still_failed, f)
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(still_failed))
         logger.info(f"Updated failed Steam IDs saved to {output_file}")
     except Exception as e:
         logger.error(f"Failed to save still failed IDs: {e}")
 
-def main():
-    """Main function to retry failed SteamSpy fetches."""
-    print("SteamSpy Retry Tool")
-    print("Retrying failed SteamSpy fetches...")
-    
+async def run_retry(session: aiohttp.ClientSession, cache: sqlite3.Connection,
+                    enriched_games: Optional[List[Dict[str, Any]]] = None,
+                    failed_steam_ids: Optional[List[int]] = None):
+    """Retry failed SteamSpy fetches and save the results; failed IDs and enriched games are loaded from disk unless given."""
     # Load failed Steam IDs
-    failed_steam_ids = load_failed_steam_ids()
+    if failed_steam_ids is None:
+        failed_steam_ids = load_failed_steam_ids()
     if not failed_steam_ids:
         logger.info("No failed Steam IDs to retry")
         return
     
     # Load enriched games
-    enriched_games = load_enriched_games()
+    if enriched_games is None:
+        enriched_games = load_enriched_games()
     if not enriched_games:
         logger.error("Failed to load enriched games. Exiting.")
         return
     
     # Retry failed fetches
-    updated_games, still_failed = retry_failed_fetches(failed_steam_ids, enriched_games)
+    updated_games, still_failed = await retry_failed_fetches(session, failed_steam_ids, enriched_games, cache)
     
     # Save updated data
-    save_updated_games(updated_games)
+    save_updated_games(updated_games, cache=cache)
     save_still_failed(still_failed)
     
     print(f"\nRetry complete!")
@@ -170,5 +181,21 @@ def main():
     print(f"Now successful: {len(failed_steam_ids) - len(still_failed)}")
     print(f"Still failed: {len(still_failed)}")
 
+def main():
+    """Main function to retry failed SteamSpy fetches."""
+    print("SteamSpy Retry Tool")
+    print("Retrying failed SteamSpy fetches...")
+    
+    async def run(cache: sqlite3.Connection):
+        async with create_steamspy_session() as session:
+            await run_retry(session, cache)
+    
+    with closing(open_steamspy_cache()) as cache:
+        seed_steamspy_cache(cache)
+        try:
+            asyncio.run(run(cache))
+        finally:
+            cache.commit()
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,29 @@
+"""
+Steam app ID lookup shared by the IGDB fetch and SteamSpy enrichment scripts.
+"""
+
+from typing import Any, Dict, Optional
+
+# IGDB external_game_source names that identify a Steam app
+STEAM_SOURCE_NAMES = frozenset({'Steam'})
+
+def extract_steam_app_id(game: Dict[str, Any]) -> Optional[int]:
+    """
+    Extract the Steam app ID from an IGDB game's external_games field.
+
+    Args:
+        game (Dict): IGDB game data
+
+    Returns:
+        Optional[int]: Steam app ID or None if not found
+    """
+    external_games = game.get('external_games')
+    if not external_games:
+        return None
+
+    steam_uids = (
+        str(external_game.get('uid', ''))
+        for external_game in external_games
+        if (external_game.get('external_game_source') or {}).get('name') in STEAM_SOURCE_NAMES
+    )
+    return next((int(uid) for uid in steam_uids if uid.isdecimal()), None)
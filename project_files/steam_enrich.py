@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Entry point for the SteamSpy enrichment pipeline.
+
+Runs the enrichment from enrich_igdb_with_steam.py and, with --retry-failed,
+the retry pass from retry_failed_steamspy.py straight after it. Both phases
+share one SteamSpy session, so the retry reuses the connections and DNS cache
+warmed up by the enrichment instead of starting cold.
+
+Usage:
+    python -m steam_enrich [--retry-failed]
+"""
+
+import argparse
+import asyncio
+import sqlite3
+from contextlib import closing
+
+from enrich_igdb_with_steam import (
+    create_steamspy_session,
+    open_steamspy_cache,
+    run_enrich,
+    seed_steamspy_cache
+)
+from retry_failed_steamspy import run_retry
+
+async def run(cache: sqlite3.Connection, retry_failed: bool = False):
+    """
+    Run the enrichment, then optionally the retry pass, over one session.
+    
+    Args:
+        cache (sqlite3.Connection): SteamSpy response cache
+        retry_failed (bool): Whether to retry failed fetches after enriching
+    """
+    async with create_steamspy_session() as session:
+        enriched_games, failed_steam_ids = await run_enrich(session, cache)
+        
+        # Hand over this run's failures directly, rather than via failed_steamspy_fetches.json
+        if retry_failed and enriched_games and failed_steam_ids:
+            print("\nRetrying failed SteamSpy fetches...")
+            await run_retry(session, cache, enriched_games, failed_steam_ids)
+
+def main():
+    """Parse arguments and run the pipeline."""
+    parser = argparse.ArgumentParser(description='Enrich IGDB games with Steam data from SteamSpy API.')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='retry failed SteamSpy fetches after enriching, reusing the same session')
+    args = parser.parse_args()
+    
+    print("IGDB-Steam Enrichment Tool")
+    print("Enriching IGDB games with Steam data from SteamSpy API...")
+    
+    with closing(open_steamspy_cache()) as cache:
+        seed_steamspy_cache(cache)
+        try:
+            asyncio.run(run(cache, args.retry_failed))
+        finally:
+            # Keep whatever was fetched, even if the run was interrupted
+            cache.commit()
+
+if __name__ == '__main__':
+    main()